@@ -3,39 +3,170 @@ AI Research Assistant
 A tool to help with research tasks using LangChain, OpenAI, and web scraping
 """
 
+import asyncio
+import contextlib
+import functools
+import json
 import os
-from typing import List, Optional
+import pickle
+import platform
+import re
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
+import faiss
+import numpy as np
+from langchain.docstore.document import Document
+from langchain.docstore.in_memory import InMemoryDocstore
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.vectorstores import FAISS
-from langchain.embeddings import OpenAIEmbeddings
+from langchain.vectorstores.utils import DistanceStrategy
+from langchain.embeddings import CacheBackedEmbeddings, OpenAIEmbeddings
+from langchain.storage import LocalFileStore
 from langchain.chat_models import ChatOpenAI
-from langchain.chains import RetrievalQA
-from bs4 import BeautifulSoup
-import requests
+from langchain.chains.question_answering import load_qa_chain
+from langchain.prompts import PromptTemplate
+from openai import OpenAI
+from lxml import etree
+from lxml import html as lh
+import httpx
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Shared HTTP/2 client so repeated requests multiplex over pooled keep-alive connections
+_WEB_LIMITS = httpx.Limits(max_connections=16, max_keepalive_connections=16)
+_WEB_CLIENT = httpx.Client(
+    transport=httpx.HTTPTransport(http2=True, limits=_WEB_LIMITS, retries=3),
+    timeout=10.0,
+    follow_redirects=True
+)
+
+# Collapses any whitespace run containing a line break (as str.splitlines sees them) or
+# a double space into one newline, matching the old strip/splitlines/split("  ") cleanup
+_WS_RE = re.compile(r'\s*(?:[\n\r\v\f\x1c-\x1e\x85\u2028\u2029]|  )\s*')
+
+# Charset declared inside the page, which lxml detects on its own
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset', re.IGNORECASE)
+
+# FAISS index used once the corpus is large enough to train it: IVF with 4-bit
+# PQ FastScan codes (16 bytes per vector), scanned with SIMD shuffle LUT kernels (AVX2 or NEON)
+IVF_INDEX_KEY = "IVF2048,PQ16x4fs"
+# Faiss needs roughly 39 training points per IVF centroid; smaller corpora use SQ_INDEX_KEY
+IVF_MIN_TRAINING_POINTS = 39 * 2048
+# PQ16 splits each vector into 16 sub-vectors, so the dimension must be divisible by 16
+IVF_DIM_MULTIPLE = 16
+# IVF lists scanned per query: the speed/recall trade-off
+IVF_NPROBE = 16
+# Exhaustive index over 8-bit scalar-quantized vectors: a quarter of the FP32 memory and
+# bandwidth per query, and it trains on any number of points
+SQ_INDEX_KEY = "SQ8"
+# Faiss has no GPU version of the FastScan or scalar-quantizer indexes above, so GPU hosts
+# build the closest layouts that index_cpu_to_all_gpus can move. Plain IVF-PQ is also the
+# layout whose inverted lists faiss can memory-map on load (FastScan lists are read into RAM)
+IVFPQ_INDEX_KEY = "IVF2048,PQ16"
+GPU_SMALL_INDEX_KEY = "Flat"
+
+# OpenAI caps a single embeddings batch job at this many inputs across all its requests
+BATCH_API_MAX_INPUTS = 50_000
+
+# Corpora at least this many characters long are split across worker processes. The
+# in-process splitter handles roughly 6-12M chars/s, while a spawned pool (the default on
+# macOS and Windows) pays ~2 s to re-import this module's dependencies in each worker, so
+# smaller corpora finish sooner in-process even with only two workers
+PARALLEL_SPLIT_MIN_CHARS = 30_000_000
+
+# QA prompt with the static instructions first and the per-question context last, so the
+# byte-identical prefix can be served from the model server's prompt/prefix cache
+QA_PROMPT = PromptTemplate(
+    template=(
+        "You are a research assistant. Use only the context below to answer the question. "
+        "If the context does not contain the answer, say that you don't know instead of "
+        "making one up. Keep the answer concise and factual.\n\n"
+        "Context:\n{context}\n\n"
+        "Question: {question}\n"
+        "Answer:"
+    ),
+    input_variables=["context", "question"]
+)
+
+# Yes/no probe deciding whether a question needs the document store at all; the
+# question comes last so the instructions stay a cacheable static prefix
+RETRIEVAL_GATE_PROMPT = (
+    "Decide whether answering the question below requires looking up external documents, "
+    "or whether it is small talk or general knowledge that can be answered directly. "
+    "Reply with exactly one word: yes if documents are required, no otherwise.\n\n"
+    "Question: {question}\n"
+    "Requires documents:"
+)
+
+# Prompt for questions the gate routes away from retrieval; it still tells the model that
+# documents are loaded so it defers instead of guessing at questions about them
+DIRECT_ANSWER_PROMPT = (
+    "You are a research assistant with a collection of loaded documents. The question below "
+    "was judged not to need those documents, so none are provided. Answer it directly. If it "
+    "turns out to be about the loaded documents, say that you need to look them up instead "
+    "of guessing.\n\n"
+    "Question: {question}\n"
+    "Answer:"
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _openai_clients(api_key: str, chat_api_base: Optional[str] = None):
+    """Return embeddings and chat clients shared by every assistant using the same API key.
+
+    chat_api_base only moves the chat model, so embeddings stay on OpenAI.
+    """
+    embeddings = OpenAIEmbeddings(openai_api_key=api_key)
+    llm = ChatOpenAI(temperature=0, openai_api_key=api_key, openai_api_base=chat_api_base)
+    return embeddings, llm
+
 
 class AIResearchAssistant:
     """AI-powered research assistant for gathering and analyzing information."""
     
-    def __init__(self, openai_api_key: Optional[str] = None):
+    def __init__(self, openai_api_key: Optional[str] = None, cache_threshold: Optional[float] = None,
+                 use_retrieval_gate: bool = False, embedding_cache_dir: str = "./emb_cache",
+                 mmap_index: bool = False):
         """
         Initialize the AI Research Assistant.
         
         Args:
             openai_api_key: OpenAI API key. If None, will use OPENAI_API_KEY env variable.
+            cache_threshold: Enable the semantic answer cache, reusing a previous question's answer when
+                its cosine similarity is at least this value. Off by default: different questions
+                about the same corpus can score very close together, so set it conservatively.
+            use_retrieval_gate: Ask the LLM first whether each question needs the documents and answer
+                those that don't without retrieval. This costs an extra LLM call per uncached
+                question, so it only pays off when most questions are not about the documents.
+            embedding_cache_dir: Directory caching chunk embeddings by content hash across runs
+            mmap_index: Build large indexes with plain IVF-PQ lists, which load_vectorstore(mmap=True)
+                can memory-map, instead of FastScan lists
         """
         self.api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OpenAI API key must be provided or set in OPENAI_API_KEY environment variable")
         
-        self.embeddings = OpenAIEmbeddings(openai_api_key=self.api_key)
-        self.llm = ChatOpenAI(temperature=0, openai_api_key=self.api_key)
+        self.embeddings, self.llm = _openai_clients(self.api_key, os.getenv("OPENAI_CHAT_API_BASE"))
+        self.document_embeddings = CacheBackedEmbeddings.from_bytes_store(
+            self.embeddings,
+            LocalFileStore(embedding_cache_dir),
+            namespace=self.embeddings.model,
+            key_encoder="sha256"
+        )
         self.vectorstore = None
-        self.qa_chain = None
+        # Stuffs the chunks retrieved by ask_questions into QA_PROMPT
+        self.qa_chain = load_qa_chain(self.llm, chain_type="stuff", prompt=QA_PROMPT)
+        self.use_retrieval_gate = use_retrieval_gate
+        self.mmap_index = mmap_index
+        
+        # Semantic answer cache, per retrieval depth k: normalized question embeddings -> answers
+        self.cache_threshold = cache_threshold
+        self._answer_cache: Dict[int, Tuple[faiss.IndexFlatIP, List[str]]] = {}
     
     def scrape_url(self, url: str) -> str:
         """
@@ -48,28 +179,85 @@ class AIResearchAssistant:
             Extracted text content from the URL
         """
         try:
-            response = requests.get(url, timeout=10)
+            response = _WEB_CLIENT.get(url)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            # Get text
-            text = soup.get_text()
-            
-            # Clean up text
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = '\n'.join(chunk for chunk in chunks if chunk)
+            return self._extract_text(response.content, response.charset_encoding)
+        except Exception as e:
+            print(f"Error scraping {url}: {str(e)}")
+            return ""
+    
+    async def scrape_url_async(self, client: httpx.AsyncClient, url: str,
+                               semaphore: Optional[asyncio.Semaphore] = None) -> str:
+        """
+        Scrape content from a URL without blocking the event loop.
+        
+        Args:
+            client: Shared async HTTP client used for the request
+            url: The URL to scrape
+            semaphore: Optional semaphore bounding the number of in-flight requests
             
-            return text
+        Returns:
+            Extracted text content from the URL
+        """
+        try:
+            async with semaphore or contextlib.nullcontext():
+                response = await client.get(url)
+            response.raise_for_status()
+            return self._extract_text(response.content, response.charset_encoding)
         except Exception as e:
             print(f"Error scraping {url}: {str(e)}")
             return ""
     
-    def create_vectorstore(self, documents: List[str], chunk_size: int = 1000, chunk_overlap: int = 200):
+    async def scrape_urls(self, urls: List[str], max_concurrency: int = 8) -> List[str]:
+        """
+        Scrape several URLs concurrently.
+        
+        Args:
+            urls: The URLs to scrape
+            max_concurrency: Maximum number of requests in flight at once
+            
+        Returns:
+            Extracted text content for each URL, in the same order as urls
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        # HTTP/2 multiplexes concurrent requests to the same origin over one connection
+        async with httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(http2=True, limits=_WEB_LIMITS, retries=3),
+            timeout=10.0,
+            follow_redirects=True
+        ) as client:
+            return await asyncio.gather(
+                *(self.scrape_url_async(client, url, semaphore) for url in urls)
+            )
+    
+    def _extract_text(self, content: bytes, encoding: Optional[str] = None) -> str:
+        """
+        Extract readable text from raw HTML content.
+        
+        Args:
+            content: Raw HTML bytes
+            encoding: Charset from the HTTP Content-Type header, if it had one
+            
+        Returns:
+            Cleaned text content
+        """
+        # lxml only sniffs <meta charset> and otherwise assumes Latin-1, so honour the
+        # header charset and fall back to UTF-8 when neither is given
+        if encoding is None and not _META_CHARSET_RE.search(content[:4096]):
+            encoding = "utf-8"
+        tree = lh.fromstring(content, parser=lh.HTMLParser(encoding=encoding))
+        
+        # Remove script and style elements
+        etree.strip_elements(tree, "script", "style", with_tail=False)
+        
+        # Get text
+        text = tree.text_content()
+        
+        # Clean up text
+        return _WS_RE.sub('\n', text).strip()
+    
+    def create_vectorstore(self, documents: List[str], chunk_size: int = 1000, chunk_overlap: int = 200,
+                           batch_size: int = 1000):
         """
         Create a FAISS vectorstore from documents.
         
@@ -77,60 +265,389 @@ class AIResearchAssistant:
             documents: List of text documents
             chunk_size: Size of text chunks
             chunk_overlap: Overlap between chunks
+            batch_size: Number of chunks sent per embeddings request
+        """
+        texts = self._split_documents(documents, chunk_size, chunk_overlap)
+        
+        # The embeddings endpoint accepts a list input, so send whole batches per request
+        vectors = []
+        for start in range(0, len(texts), batch_size):
+            vectors.extend(self.document_embeddings.embed_documents(texts[start:start + batch_size]))
+        
+        self._set_vectorstore(texts, vectors)
+    
+    async def acreate_vectorstore(self, documents: List[str], chunk_size: int = 1000, chunk_overlap: int = 200,
+                                  batch_size: int = 1000, max_concurrency: int = 5):
+        """
+        Create a FAISS vectorstore from documents, embedding batches concurrently.
+        
+        Args:
+            documents: List of text documents
+            chunk_size: Size of text chunks
+            chunk_overlap: Overlap between chunks
+            batch_size: Number of chunks sent per embeddings request
+            max_concurrency: Maximum number of embeddings requests in flight, to stay within rate limits
         """
+        # Splitting is CPU-bound, so keep it off the event loop
+        texts = await asyncio.get_running_loop().run_in_executor(
+            None, self._split_documents, documents, chunk_size, chunk_overlap
+        )
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self.document_embeddings.aembed_documents(batch)
+        
+        results = await asyncio.gather(
+            *(embed_batch(texts[start:start + batch_size]) for start in range(0, len(texts), batch_size))
+        )
+        vectors = [vector for batch_vectors in results for vector in batch_vectors]
+        
+        self._set_vectorstore(texts, vectors)
+    
+    def create_vectorstore_batch(self, documents: List[str], chunk_size: int = 1000, chunk_overlap: int = 200,
+                                 batch_size: int = 1000, poll_interval: int = 60):
+        """
+        Create a FAISS vectorstore using the OpenAI Batch API for the embeddings.
+        
+        Batch jobs complete within 24 hours at a lower cost than real-time
+        requests, which suits large one-off ingestions. Chunks already in the
+        embedding cache are not resubmitted, and new results are added to it.
+        This call blocks until the job finishes.
+        
+        Args:
+            documents: List of text documents
+            chunk_size: Size of text chunks
+            chunk_overlap: Overlap between chunks
+            batch_size: Number of chunks per embeddings request in the batch file
+            poll_interval: Seconds to wait between job status checks
+        """
+        texts = self._split_documents(documents, chunk_size, chunk_overlap)
+        
+        # Only submit chunks that are not already in the embedding cache
+        store = self.document_embeddings.document_embedding_store
+        vectors = store.mget(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            new_vectors = self._embed_with_batch_api(missing_texts, batch_size, poll_interval)
+            store.mset(list(zip(missing_texts, new_vectors)))
+            for i, vector in zip(missing, new_vectors):
+                vectors[i] = vector
+        
+        self._set_vectorstore(texts, vectors)
+    
+    def _embed_with_batch_api(self, texts: List[str], batch_size: int, poll_interval: int) -> List[List[float]]:
+        """
+        Embed texts with OpenAI Batch API jobs and wait for the results.
+        
+        Args:
+            texts: Text chunks to embed
+            batch_size: Number of chunks per embeddings request in the batch file
+            poll_interval: Seconds to wait between job status checks
+            
+        Returns:
+            The embedding for each chunk, in the same order as texts
+        """
+        client = OpenAI(api_key=self.api_key)
+        
+        # Embeddings batches are capped on total inputs, so larger corpora are split across jobs
+        jobs = [
+            (offset, self._submit_embeddings_batch(client, texts[offset:offset + BATCH_API_MAX_INPUTS], batch_size))
+            for offset in range(0, len(texts), BATCH_API_MAX_INPUTS)
+        ]
+        
+        vectors = [None] * len(texts)
+        for offset, batch in jobs:
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                time.sleep(poll_interval)
+                batch = client.batches.retrieve(batch.id)
+            if batch.status != "completed":
+                raise RuntimeError(f"Embeddings batch {batch.id} finished with status '{batch.status}'")
+
+            # Failed requests are written to a separate error file, not the output file
+            if batch.error_file_id:
+                line = client.files.content(batch.error_file_id).text.splitlines()[0]
+                record = json.loads(line)
+                error = record.get("error") or (record.get("response") or {}).get("body", {}).get("error")
+                raise RuntimeError(
+                    f"Embeddings request {record['custom_id']} in batch {batch.id} failed: {error}"
+                )
+            if not batch.output_file_id:
+                raise RuntimeError(f"Embeddings batch {batch.id} completed without an output file")
+
+            for line in client.files.content(batch.output_file_id).text.splitlines():
+                record = json.loads(line)
+                response = record.get("response")
+                if record.get("error") or not response or response.get("status_code") != 200:
+                    error = record.get("error") or (response or {}).get("body", {}).get("error")
+                    raise RuntimeError(
+                        f"Embeddings request {record['custom_id']} in batch {batch.id} failed: {error}"
+                    )
+                start = offset + int(record["custom_id"])
+                for item in response["body"]["data"]:
+                    vectors[start + item["index"]] = item["embedding"]
+        if any(vector is None for vector in vectors):
+            raise RuntimeError("Embeddings batch is missing results for some text chunks")
+        return vectors
+    
+    def _submit_embeddings_batch(self, client: OpenAI, texts: List[str], batch_size: int):
+        """Upload texts as a JSONL file of embeddings requests and start a batch job over it."""
+        # One embeddings request per line, keyed by the index of its first chunk
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False, encoding="utf-8") as f:
+            for start in range(0, len(texts), batch_size):
+                f.write(json.dumps({
+                    "custom_id": str(start),
+                    "method": "POST",
+                    "url": "/v1/embeddings",
+                    "body": {"model": self.embeddings.model, "input": texts[start:start + batch_size]}
+                }) + "\n")
+            batch_path = f.name
+        try:
+            with open(batch_path, "rb") as f:
+                batch_file = client.files.create(file=f, purpose="batch")
+        finally:
+            os.remove(batch_path)
+        
+        batch = client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/embeddings",
+            completion_window="24h"
+        )
+        print(f"Submitted embeddings batch {batch.id} for {len(texts)} text chunks")
+        return batch
+    
+    def _split_documents(self, documents: List[str], chunk_size: int, chunk_overlap: int) -> List[str]:
+        """Split documents into text chunks, dropping exact duplicate chunks."""
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap
         )
         
-        texts = []
-        for doc in documents:
-            texts.extend(text_splitter.split_text(doc))
+        # Splitting is pure-Python CPU work, so large corpora fan out over processes,
+        # one document per task so every worker gets its own share
+        workers = min(os.cpu_count() or 1, len(documents))
+        if workers > 1 and sum(len(doc) for doc in documents) >= PARALLEL_SPLIT_MIN_CHARS:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                groups = pool.map(text_splitter.split_text, documents, chunksize=1)
+                texts = [chunk for group in groups for chunk in group]
+        else:
+            texts = [chunk for doc in documents for chunk in text_splitter.split_text(doc)]
+        return list(dict.fromkeys(texts))
+    
+    def _set_vectorstore(self, texts: List[str], vectors: List[List[float]]):
+        """Index pre-computed chunk embeddings."""
+        self.vectorstore = self._build_faiss(texts, vectors)
+        self._reset_answer_cache()
+        
+        print(f"Vectorstore created with {len(texts)} text chunks")
+    
+    def _build_faiss(self, texts: List[str], vectors: List[List[float]]) -> FAISS:
+        """
+        Build a FAISS vectorstore over pre-computed embeddings.
         
-        self.vectorstore = FAISS.from_texts(texts, self.embeddings)
+        OpenAI embeddings are unit length, so inner product equals cosine similarity.
+        
+        Args:
+            texts: Text chunks
+            vectors: Embedding for each chunk
+            
+        Returns:
+            The FAISS vectorstore
+        """
+        vecs = np.asarray(vectors, dtype="float32")
+        use_gpu = faiss.get_num_gpus() > 0
+        use_ivf = len(vecs) >= IVF_MIN_TRAINING_POINTS and vecs.shape[1] % IVF_DIM_MULTIPLE == 0
+        if use_ivf:
+            index_key = IVFPQ_INDEX_KEY if use_gpu or self.mmap_index else IVF_INDEX_KEY
+        else:
+            index_key = GPU_SMALL_INDEX_KEY if use_gpu else SQ_INDEX_KEY
+        index = faiss.index_factory(vecs.shape[1], index_key, faiss.METRIC_INNER_PRODUCT)
+        if use_ivf:
+            # On x86 the FastScan kernels need AVX2; other architectures have their own (NEON on arm64)
+            if (index_key == IVF_INDEX_KEY and platform.machine().lower() in ("x86_64", "amd64", "i386", "i686")
+                    and "AVX2" not in faiss.supported_instruction_sets()):
+                print("Warning: this CPU does not support AVX2, FastScan will use its slower scalar kernels")
+            faiss.extract_index_ivf(index).nprobe = IVF_NPROBE
+        if not index.is_trained:
+            index.train(vecs)
+        index.add(vecs)
+        if use_gpu:
+            index = self._maybe_to_gpu(index)
         
-        # Create QA chain
-        self.qa_chain = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            chain_type="stuff",
-            retriever=self.vectorstore.as_retriever()
+        ids = [str(uuid.uuid4()) for _ in texts]
+        docstore = InMemoryDocstore({id_: Document(page_content=text) for id_, text in zip(ids, texts)})
+        return FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=dict(enumerate(ids)),
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
         )
+    
+    def _maybe_to_gpu(self, index):
+        """
+        Move a FAISS index onto all available GPUs.
         
-        print(f"Vectorstore created with {len(texts)} text chunks")
+        The index stays on the CPU if there are no GPUs, or if it was built on a
+        CPU-only host with a layout faiss cannot run on a GPU.
+        """
+        if faiss.get_num_gpus() == 0:
+            return index
+        try:
+            return faiss.index_cpu_to_all_gpus(index)
+        except RuntimeError as e:
+            print(f"Keeping FAISS index on CPU: {str(e)}")
+            return index
+    
+    @staticmethod
+    def _is_gpu_index(index) -> bool:
+        """Check whether a FAISS index lives on the GPU (directly or sharded/replicated across GPUs)."""
+        return type(index).__name__.startswith("Gpu") or isinstance(index, (faiss.IndexReplicas, faiss.IndexShards))
     
     def ask_question(self, question: str) -> str:
         """
         Ask a question based on the loaded documents.
         
+        With cache_threshold set, answers to semantically similar earlier questions are served from the cache.
+        
         Args:
             question: The question to ask
             
         Returns:
             The answer from the QA chain
         """
-        if not self.qa_chain:
-            return "No documents loaded. Please create a vectorstore first."
+        return self.ask_questions([question])[0]
+    
+    def ask_questions(self, questions: List[str], k: int = 4) -> List[str]:
+        """
+        Ask several questions with a single batched similarity search.
+        
+        Args:
+            questions: The questions to ask
+            k: Number of text chunks retrieved per question
+            
+        Returns:
+            The answer to each question, in the same order as questions
+        """
+        if not self.vectorstore:
+            return ["No documents loaded. Please create a vectorstore first."] * len(questions)
+        
+        q_matrix = np.asarray(self.embeddings.embed_documents(questions), dtype="float32")
+        answers = [self._cache_lookup(q_matrix[i:i + 1], k) for i in range(len(questions))]
+        misses = [i for i, answer in enumerate(answers) if answer is None]
+        
+        # Optionally skip retrieval and the document context for questions that don't need them
+        if self.use_retrieval_gate:
+            for i in misses:
+                if not self._needs_retrieval(questions[i]):
+                    answers[i] = self.llm.invoke(DIRECT_ANSWER_PROMPT.format(question=questions[i])).content
+                    self._cache_insert(q_matrix[i:i + 1], k, answers[i])
+            misses = [i for i in misses if answers[i] is None]
+        if not misses:
+            return answers
         
-        result = self.qa_chain.run(question)
-        return result
+        # One search over the whole query matrix; GPU indexes gain most from batched queries
+        _, indices = self.vectorstore.index.search(q_matrix[misses], k)
+        
+        for i, row in zip(misses, indices):
+            docs = [
+                self.vectorstore.docstore.search(self.vectorstore.index_to_docstore_id[j])
+                for j in row if j != -1
+            ]
+            answers[i] = self.qa_chain.run(input_documents=docs, question=questions[i])
+            self._cache_insert(q_matrix[i:i + 1], k, answers[i])
+        return answers
+    
+    def _needs_retrieval(self, question: str) -> bool:
+        """Ask the LLM whether answering the question requires the loaded documents."""
+        reply = self.llm.invoke(RETRIEVAL_GATE_PROMPT.format(question=question)).content
+        return not reply.strip().lower().startswith("no")
+    
+    def _cache_lookup(self, q_vec: np.ndarray, k: int) -> Optional[str]:
+        """Return the cached answer for the most similar earlier question asked with the same k, if it is close enough."""
+        if self.cache_threshold is None or k not in self._answer_cache:
+            return None
+        cache_index, cache_answers = self._answer_cache[k]
+        q_vec = q_vec.copy()
+        faiss.normalize_L2(q_vec)
+        similarities, indices = cache_index.search(q_vec, 1)
+        if similarities[0][0] >= self.cache_threshold:
+            return cache_answers[indices[0][0]]
+        return None
+    
+    def _cache_insert(self, q_vec: np.ndarray, k: int, answer: str):
+        """Add a question embedding and its answer to the semantic cache for retrieval depth k."""
+        if self.cache_threshold is None:
+            return
+        q_vec = q_vec.copy()
+        faiss.normalize_L2(q_vec)
+        if k not in self._answer_cache:
+            self._answer_cache[k] = (faiss.IndexFlatIP(q_vec.shape[1]), [])
+        cache_index, cache_answers = self._answer_cache[k]
+        cache_index.add(q_vec)
+        cache_answers.append(answer)
     
     def save_vectorstore(self, path: str):
         """Save the vectorstore to disk."""
         if self.vectorstore:
-            self.vectorstore.save_local(path)
+            # FAISS can only serialize CPU indexes
+            index = self.vectorstore.index
+            if self._is_gpu_index(index):
+                self.vectorstore.index = faiss.index_gpu_to_cpu(index)
+            try:
+                self.vectorstore.save_local(path)
+            finally:
+                self.vectorstore.index = index
             print(f"Vectorstore saved to {path}")
         else:
             print("No vectorstore to save")
     
-    def load_vectorstore(self, path: str):
-        """Load a vectorstore from disk."""
-        self.vectorstore = FAISS.load_local(path, self.embeddings)
-        self.qa_chain = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            chain_type="stuff",
-            retriever=self.vectorstore.as_retriever()
-        )
+    def load_vectorstore(self, path: str, mmap: bool = False, allow_dangerous_deserialization: bool = False):
+        """
+        Load a vectorstore from disk.
+        
+        Args:
+            path: Directory the vectorstore was saved to
+            mmap: Memory-map the index read-only, so only the inverted-list pages touched by
+                queries are loaded. This only helps plain IVF indexes (built with mmap_index=True
+                or on a GPU host); other index types are still read fully into RAM.
+            allow_dangerous_deserialization: Unpickle the saved docstore. Only enable this for
+                vectorstores you created yourself, since pickle files can execute arbitrary code.
+        """
+        if mmap:
+            if not allow_dangerous_deserialization:
+                raise ValueError(
+                    "Loading the docstore requires unpickling index.pkl, which can execute arbitrary code. "
+                    "Set allow_dangerous_deserialization=True if you trust the source of this vectorstore."
+                )
+            index = faiss.read_index(
+                os.path.join(path, "index.faiss"),
+                faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+            )
+            with open(os.path.join(path, "index.pkl"), "rb") as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+            self.vectorstore = FAISS(
+                embedding_function=self.embeddings,
+                index=index,
+                docstore=docstore,
+                index_to_docstore_id=index_to_docstore_id,
+                distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+            )
+        else:
+            self.vectorstore = FAISS.load_local(
+                path,
+                self.embeddings,
+                allow_dangerous_deserialization=allow_dangerous_deserialization,
+                distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+            )
+        self.vectorstore.index = self._maybe_to_gpu(self.vectorstore.index)
+        self._reset_answer_cache()
         print(f"Vectorstore loaded from {path}")
+    
+    def _reset_answer_cache(self):
+        """Clear answers cached for the previous vectorstore."""
+        self._answer_cache = {}
 
 
 def main():
@@ -159,16 +676,13 @@ def main():
     ]
     
     if urls:
-        documents = []
-        for url in urls:
-            print(f"Scraping: {url}")
-            content = assistant.scrape_url(url)
-            if content:
-                documents.append(content)
+        print(f"Scraping {len(urls)} URLs...")
+        contents = asyncio.run(assistant.scrape_urls(urls))
+        documents = [content for content in contents if content]
         
         if documents:
             print(f"\nCreating vectorstore from {len(documents)} documents...")
-            assistant.create_vectorstore(documents)
+            asyncio.run(assistant.acreate_vectorstore(documents))
             
             # Example questions
             questions = [
@@ -176,9 +690,8 @@ def main():
                 "Summarize the key points.",
             ]
             
-            for question in questions:
+            for question, answer in zip(questions, assistant.ask_questions(questions)):
                 print(f"\nQ: {question}")
-                answer = assistant.ask_question(question)
                 print(f"A: {answer}")
     else:
         print("No URLs provided. Add URLs to the 'urls' list to test the assistant.")
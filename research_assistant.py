@@ -1,21 +1,49 @@
+import asyncio
 import os
 import sys
 from dotenv import load_dotenv
+import httpx
 from langchain_openai import OpenAI, OpenAIEmbeddings
-from bs4 import BeautifulSoup
 from langchain_text_splitters import CharacterTextSplitter
-import requests
+import tiktoken
+from lxml import etree
+from lxml import html as lh
 from langchain_community.vectorstores import FAISS
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Shared HTTP/2 connection pools for Wikipedia and OpenAI, reused by every request
+_HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=32)
+_HTTP_CLIENT = httpx.Client(
+    transport=httpx.HTTPTransport(http2=True, limits=_HTTP_LIMITS, retries=3),
+    follow_redirects=True
+)
+_ASYNC_HTTP_CLIENT = httpx.AsyncClient(
+    transport=httpx.AsyncHTTPTransport(http2=True, limits=_HTTP_LIMITS, retries=3),
+    follow_redirects=True
+)
+
 # Initialize OpenAI model
 api_key = os.getenv("OPENAI_API_KEY")
 if not api_key:
     raise ValueError("OPENAI_API_KEY not found in environment variables. Please check your .env file.")
 
-openai_model = OpenAI(temperature=0.7, openai_api_key=api_key)
+openai_model = OpenAI(
+    temperature=0.7,
+    openai_api_key=api_key,
+    streaming=True,
+    http_client=_HTTP_CLIENT,
+    http_async_client=_ASYNC_HTTP_CLIENT
+)
+embeddings_model = OpenAIEmbeddings(
+    openai_api_key=api_key,
+    http_client=_HTTP_CLIENT,
+    http_async_client=_ASYNC_HTTP_CLIENT
+)
+
+# Tokenizer matching the completion model, for exact prompt-size budgeting
+_ENCODING = tiktoken.encoding_for_model(openai_model.model_name)
 
 # Gather information
 def gather_information(topic):
@@ -33,24 +61,45 @@ def gather_information(topic):
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
-        response = requests.get(url, headers=headers, timeout=10)
+        response = _HTTP_CLIENT.get(url, headers=headers, timeout=10.0)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        paragraphs = soup.find_all('p')
-        text = ' '.join([para.text for para in paragraphs])
+        # Decode with the charset httpx reports; lxml alone would assume Latin-1
+        tree = lh.fromstring(response.content, parser=lh.HTMLParser(encoding=response.encoding))
+        text = ' '.join(para.text_content() for para in tree.iter('p'))
         return text
-    except requests.RequestException as e:
+    except (httpx.HTTPError, etree.ParserError) as e:
         print(f"Error fetching information for topic '{topic}': {str(e)}")
         return ""
     
 # Truncate text to manageable size  
 def truncate_text(text, max_tokens=2000): 
-    """ Truncate text to approximately max_tokens. """ 
-    words = text.split() 
-    return ' '.join(words[:max_tokens])
+    """ Truncate text to at most max_tokens model tokens. """ 
+    tokens = _ENCODING.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return _ENCODING.decode(tokens[:max_tokens])
+
+# Stream a completion to stdout as it is generated
+async def stream_completion(llm, prompt):
+    """
+    Print an LLM completion token by token and return the full text.
+    
+    Args:
+        llm: The LLM to prompt
+        prompt: The prompt text
+        
+    Returns:
+        The complete generated text
+    """
+    tokens = []
+    async for token in llm.astream(prompt):
+        print(token, end='', flush=True)
+        tokens.append(token)
+    print()
+    return ''.join(tokens)
 
 # Analyse information
-def analyze_information(info):
+async def analyze_information(info):
     """
     Analyze and summarize text using OpenAI.
     
@@ -64,20 +113,10 @@ def analyze_information(info):
         return "No text to analyze."
     
     try:
-        # Create a prompt for summarization and analysis
-        prompt = f"""Please provide a comprehensive summary and analysis of the following text:
-
-{info[:4000]}  # Limit text length to avoid token limits
-
-Provide:
-1. A concise summary (2-3 sentences)
-2. Key points and main topics
-3. Any interesting insights
-"""
-        llm = OpenAI(temperature=0.7, max_tokens=500)  # Limit the response tokens 
+        llm = openai_model.bind(max_tokens=500)  # Limit the response tokens 
         truncated_info = truncate_text(info, max_tokens=1500)  # Further reduce input tokens 
         prompt = f"Summarize key points from this text:\n\n{truncated_info}\n\nKey points:" 
-        response = llm.invoke(prompt)
+        response = await stream_completion(llm, prompt)
         return response
        # summary = openai_model.invoke(prompt)
        #  return summary
@@ -86,24 +125,48 @@ Provide:
         return "Error occurred during analysis."
 
 # Generate concise summary
-def generate_summary(analysis): 
-    llm = OpenAI(temperature=0.7) 
+async def generate_summary(analysis): 
     prompt = f""" 
     Based on the following analysis, generate a concise summary: 
     {analysis} 
     Concise summary: 
     """ 
-    summary = llm.invoke(prompt) 
+    summary = await stream_completion(openai_model, prompt) 
     return summary
 
 # Create knowledge base
 def create_knowledge_base(text): 
     text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=0) 
     texts = text_splitter.split_text(text) 
-    embeddings = OpenAIEmbeddings() 
-    knowledge_base = FAISS.from_texts(texts, embeddings) 
+    knowledge_base = FAISS.from_texts(texts, embeddings_model) 
     return knowledge_base 
 
+# Analyse, then summarize while the knowledge base is built
+async def run_analysis(info):
+    """
+    Stream the analysis and summary of the gathered text.
+    
+    Runs in a single event loop so the shared async HTTP client is reused throughout.
+    
+    Args:
+        info: The gathered text
+        
+    Returns:
+        The analysis, the summary and the knowledge base
+    """
+    print("="*50)
+    print("ANALYSIS RESULTS:")
+    print("="*50)
+    analysis = await analyze_information(info)
+
+    # The summary only needs the analysis, so build the knowledge base while it streams
+    print("Summary: ", end='', flush=True)
+    summary, kb = await asyncio.gather(
+        generate_summary(analysis),
+        asyncio.to_thread(create_knowledge_base, info)
+    )
+    return analysis, summary, kb
+
 # Query knowledge base
 def query_knowledge_base(query, kb): 
     docs = kb.similarity_search(query, k=1) 
@@ -128,17 +191,9 @@ if __name__ == "__main__":
     if info:
         print(f"\nGathered {len(info)} characters of text.")
         print("\nAnalyzing information...\n")
-        analysis = analyze_information(info)
         
-        # Display results
-        print("="*50)
-        print("ANALYSIS RESULTS:")
-        print("="*50)
-        print(analysis)
-
-        summary = generate_summary(analysis) 
-        print(f"Summary: {summary}") 
-        kb = create_knowledge_base(info) 
+        # Display results as they stream in
+        analysis, summary, kb = asyncio.run(run_analysis(info))
         query = "What are the main applications of AI?" 
         result = query_knowledge_base(query, kb) 
         print(f"Query result: {result}")